@@ -1,41 +1,130 @@
 # client.py
+import argparse
 import asyncio
+import json
+import logging
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
 
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport
 
+# Tool listings are static per server version (a hash of main.py's source), so keep them across runs.
+TOOLS_CACHE_PATH = Path.home() / ".cache" / "usaspending-mcp" / "tools.json"
 
-async def main() -> None:
-    # Connect to the MCP server running on localhost:8000 via streamable HTTP
-    transport = StreamableHttpTransport(url="http://localhost:8000/mcp")
+# Connect to the MCP server running on localhost:8000 via streamable HTTP
+client = Client(StreamableHttpTransport(url="http://localhost:8000/mcp"))
 
-    client = Client(transport)
 
-    async with client:
-        # Basic connectivity check
-        await client.ping()
-        print("✅ ping ok")
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread instead of the caller."""
 
-        # List tools exposed by server
-        tools = await client.list_tools()
-        print("\n🧰 tools:")
-        for t in tools:
-            # tool objects are pydantic-like; fall back to dict access if needed
-            name = getattr(t, "name", None) or (t.get("name") if isinstance(t, dict) else str(t))
-            desc = getattr(t, "description", None) or (t.get("description") if isinstance(t, dict) else "")
-            print(f" - {name}: {desc}")
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message here, on the event loop's thread. Records
+        # stay in-process, so they can go onto the queue untouched.
+        return record
 
-        # Call recipient_autocomplete
-        print("\n▶ calling recipient_autocomplete...")
-        auto = await client.call_tool(
+
+# Client output is queued here and written to stdout by a background thread, so the event
+# loop neither formats records nor blocks on stdout. Nothing is written until the listener
+# runs; see stdout_logging().
+log = logging.getLogger("usaspending_mcp.client")
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+log.addHandler(_DeferredQueueHandler(_log_queue))
+
+
+def _is_prompt(record: logging.LogRecord) -> bool:
+    return getattr(record, "prompt", False)
+
+
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+_stdout_handler.addFilter(lambda record: not _is_prompt(record))
+# Prompts are written without a trailing newline so input is typed on the same line.
+_prompt_handler = logging.StreamHandler(sys.stdout)
+_prompt_handler.terminator = ""
+_prompt_handler.setFormatter(logging.Formatter("%(message)s"))
+_prompt_handler.addFilter(_is_prompt)
+_log_listener = QueueListener(_log_queue, _stdout_handler, _prompt_handler)
+
+
+@contextmanager
+def stdout_logging() -> Iterator[None]:
+    """Write this module's log output to stdout for the duration of the block."""
+    _log_listener.start()
+    try:
+        yield
+    finally:
+        # Flushes anything still queued before returning.
+        _log_listener.stop()
+
+
+def _trunc(x: Any, n: int = 500) -> str:
+    """Short preview of ``x``; strings and bytes are sliced before any repr is built."""
+    if isinstance(x, str):
+        return x if len(x) <= n else x[:n] + "…"
+    if isinstance(x, bytes):
+        return repr(x[:n]) + ("…" if len(x) > n else "")
+    s = repr(x)
+    return s if len(s) <= n else s[:n] + "…"
+
+
+def _server_key(client: Client) -> Optional[str]:
+    """Identify the connected server build by name and version, if it reported them."""
+    info = getattr(client, "server_info", None)
+    if info is None:
+        # older fastmcp releases only expose the raw initialize result
+        info = getattr(getattr(client, "initialize_result", None), "serverInfo", None)
+    if info is None:
+        return None
+    return f"{getattr(info, 'name', '')}@{getattr(info, 'version', '')}"
+
+
+async def list_tools_cached(client: Client) -> List[Tuple[str, str]]:
+    """Return (name, description) pairs, reusing the on-disk listing for the same server build."""
+    key = _server_key(client)
+    if key is not None:
+        try:
+            cached = json.loads(TOOLS_CACHE_PATH.read_text())
+            if cached.get("server") == key:
+                return [(name, desc) for name, desc in cached["tools"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    tools: List[Tuple[str, str]] = []
+    for t in await client.list_tools():
+        # tool objects are pydantic-like; fall back to dict access if needed
+        name = getattr(t, "name", None) or (t.get("name") if isinstance(t, dict) else str(t))
+        desc = getattr(t, "description", None) or (t.get("description") if isinstance(t, dict) else "")
+        tools.append((name, desc or ""))
+
+    if key is not None:
+        try:
+            TOOLS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            TOOLS_CACHE_PATH.write_text(json.dumps({"server": key, "tools": tools}))
+        except OSError:
+            pass
+    return tools
+
+
+async def run_once(client: Client) -> None:
+    """Exercise each tool once over an already-connected client."""
+    # The four tool calls are independent, so issue them concurrently
+    log.info("\n▶ calling recipient_autocomplete, spending_by_award, recipient_children, recipient_list...")
+    auto, sba, kids, rlist = await asyncio.gather(
+        client.call_tool(
             "recipient_autocomplete",
             {"search_text": "Holdings", "limit": 5},
-        )
-        print("recipient_autocomplete result (truncated):", str(auto)[:500])
-
-        # Call spending_by_award (minimal example)
-        print("\n▶ calling spending_by_award...")
-        sba = await client.call_tool(
+        ),
+        # Minimal spending_by_award example
+        client.call_tool(
             "spending_by_award",
             {
                 "subawards": False,
@@ -49,27 +138,107 @@ async def main() -> None:
                 "order": "desc",
                 "spending_level": "awards",
             },
-        )
-        print("spending_by_award result (truncated):", str(sba)[:800])
-
-        # Call recipient_children (use a sample from the docs)
-        print("\n▶ calling recipient_children...")
-        kids = await client.call_tool(
+        ),
+        # Sample parent DUNS from the docs
+        client.call_tool(
             "recipient_children",
             {"duns_or_uei": "001006360", "year": "2017"},
-        )
-        print("recipient_children result (truncated):", str(kids)[:800])
-
-        # Call recipient_list (use a sample agency/year from docs)
-        print("\n▶ calling recipient_list...")
-        rlist = await client.call_tool(
+        ),
+        # Sample agency/year from the docs
+        client.call_tool(
             "recipient_list",
             {"awarding_agency_id": 183, "fiscal_year": 2017, "limit": 5, "page": 1},
-        )
-        print("recipient_list result (truncated):", str(rlist)[:800])
+        ),
+    )
+    log.info("recipient_autocomplete result (truncated): %s", _trunc(auto))
+    log.info("spending_by_award result (truncated): %s", _trunc(sba, 800))
+    log.info("recipient_children result (truncated): %s", _trunc(kids, 800))
+    log.info("recipient_list result (truncated): %s", _trunc(rlist, 800))
+
+
+def _read_stdin_lines() -> "asyncio.Queue[Optional[str]]":
+    """Feed stdin lines into a queue from a daemon thread; ``None`` marks EOF.
+
+    A daemon thread, unlike asyncio.to_thread, never holds up interpreter or loop shutdown
+    while it sits blocked on a read, so Ctrl-C exits promptly.
+    """
+    loop = asyncio.get_running_loop()
+    lines: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    def pump() -> None:
+        try:
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+        except RuntimeError:
+            # The loop closed while we were blocked on stdin.
+            pass
+
+    threading.Thread(target=pump, name="stdin-reader", daemon=True).start()
+    return lines
 
-    print("\n✅ done")
+
+async def repl(client: Client) -> None:
+    """Keep the session open and re-run the sample calls on demand."""
+    log.info("\nREPL: <enter> or 'run' repeats the sample calls, 'quit' or Ctrl-C exits.")
+    lines = _read_stdin_lines()
+    while True:
+        # The prompt goes through the same queue as run_once's output so it can't overtake
+        # results the listener thread hasn't written yet.
+        log.info("usaspending> ", extra={"prompt": True})
+        try:
+            line = await lines.get()
+        except asyncio.CancelledError:
+            # Ctrl-C at the prompt: asyncio.run cancels the main task; leave like 'quit'.
+            log.info("")
+            break
+        if line is None:
+            break
+        cmd = line.strip().lower()
+        if cmd in ("quit", "exit", "q"):
+            break
+        if cmd in ("", "run"):
+            await run_once(client)
+        else:
+            log.info("unknown command: %s", cmd)
+
+
+async def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exercise the USAspending MCP server.")
+    parser.add_argument("--repeat", type=int, default=1, help="run the sample calls N times on one connection")
+    parser.add_argument("--repl", action="store_true", help="stay connected and run the sample calls on demand")
+    args = parser.parse_args(argv)
+
+    with stdout_logging():
+        # One MCP handshake per process; every run reuses the session.
+        async with client:
+            # Basic connectivity check
+            await client.ping()
+            log.info("✅ ping ok")
+
+            # List tools exposed by server
+            tools = await list_tools_cached(client)
+            log.info("\n🧰 tools:")
+            for name, desc in tools:
+                log.info(" - %s: %s", name, desc)
+
+            if args.repl:
+                await repl(client)
+            else:
+                for _ in range(max(1, args.repeat)):
+                    await run_once(client)
+
+        log.info("\n✅ done")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        from uvloop import run as run_loop
+    except ImportError:
+        from asyncio import run as run_loop
+
+    try:
+        run_loop(main())
+    except KeyboardInterrupt:
+        # Ctrl-C outside the REPL prompt (e.g. mid-call); output was already flushed on the way out.
+        pass
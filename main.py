@@ -1,24 +1,173 @@
 # main.py
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
 import os
-from typing import Any, Dict, List, Optional, Union
+import random
+import re
+import signal
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import httpx
+import msgspec
+import orjson
+from cachetools import TTLCache
 from fastmcp import FastMCP
 from fastmcp.exceptions import ToolError
 
 BASE_URL = os.getenv("USASPENDING_BASE_URL", "https://api.usaspending.gov").rstrip("/")
 
-mcp = FastMCP("USAspending Tools", mask_error_details=True)
-
-# Reuse a single client for performance.
-_http_client = httpx.AsyncClient(
-    base_url=BASE_URL,
-    timeout=httpx.Timeout(30.0),
-    headers={"Accept": "application/json"},
+# Reported to clients as serverInfo.version and used by client.py as its tool-list cache key.
+# Hashing this module's source means any change to a tool's name, docstring or signature yields
+# a new version without anyone having to remember to bump it.
+SERVER_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+_JSON_CONTENT_TYPE = {"Content-Type": "application/json"}
+_ORDERS = frozenset({"asc", "desc"})
+_LEVELS = frozenset({"awards", "subawards"})
+# 9-digit DUNS or 12-character UEI. \Z rather than $ because $ also accepts a trailing newline,
+# and this value is interpolated into the request path.
+_DUNS_OR_UEI_RE = re.compile(r"^(?:\d{9}|[A-Z0-9]{12})\Z")
+_CHILDREN_TMPL = "/api/v2/recipient/children/%s/"
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}\Z")
+# Contracts, IDVs, grants, direct payments, loans and other financial assistance.
+_AWARD_TYPE_CODES = frozenset(
+    {
+        "A", "B", "C", "D",
+        "IDV_A", "IDV_B", "IDV_B_A", "IDV_B_B", "IDV_B_C", "IDV_C", "IDV_D", "IDV_E",
+        "02", "03", "04", "05",
+        "06", "10",
+        "07", "08",
+        "09", "11", "-1",
+    }
 )
 
+def _new_http_client() -> httpx.AsyncClient:
+    # HTTP/2 lets concurrent tool calls share one connection, and the pool is sized well
+    # above httpx's defaults for bursty traffic.
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        http2=True,
+        limits=httpx.Limits(max_connections=128, max_keepalive_connections=64, keepalive_expiry=60),
+        timeout=httpx.Timeout(30.0),
+        headers={"Accept": "application/json", "Accept-Encoding": "gzip, br"},
+    )
+
+
+# Reuse a single client for performance. The lifespan closes it on exit and rebuilds it on
+# the next entry, so in-process sessions that start and stop the server keep working.
+_http_client = _new_http_client()
+
+
+async def _warm_pool() -> None:
+    """Pay DNS/TLS/HTTP2 setup up front so the first tool call doesn't; the response is discarded."""
+    try:
+        await _http_client.get("/api/v2/references/toptier_agencies/", params={"limit": 1})
+    except httpx.HTTPError:
+        # Best effort only; the first real request will simply connect on its own.
+        pass
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(server: FastMCP) -> AsyncIterator[None]:
+    global _http_client
+    if _http_client.is_closed:
+        _http_client = _new_http_client()
+
+    # Warm in the background so startup isn't blocked on the upstream round trip.
+    warmup = asyncio.create_task(_warm_pool())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        # Let a still-running warm-up request unwind before its pool is closed underneath it.
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup
+        # Close the pool on the server's own loop so keep-alive connections shut down cleanly.
+        await _http_client.aclose()
+
+
+mcp = FastMCP("USAspending Tools", version=SERVER_VERSION, mask_error_details=True, lifespan=_lifespan)
+
+
+class _Admission:
+    """
+    Adaptive cap on concurrent upstream requests.
+
+    The limit halves when USAspending signals backpressure (429/503) and grows back by one
+    after a run of healthy responses, up to the configured ceiling.
+    """
+
+    def __init__(self, ceiling: int, grow_after: int = 20) -> None:
+        self.ceiling = max(1, ceiling)
+        self.limit = self.ceiling
+        self.active = 0
+        self._grow_after = grow_after
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify(1)
+
+    async def record(self, status_code: int) -> None:
+        """Adjust the limit based on an upstream response status."""
+        async with self._cond:
+            if status_code in (429, 503):
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            elif status_code < 500:
+                self._successes += 1
+                if self._successes >= self._grow_after and self.limit < self.ceiling:
+                    self.limit += 1
+                    self._successes = 0
+                    self._cond.notify_all()
+
+    async def __aenter__(self) -> "_Admission":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.release()
+
+
+# Cap concurrent upstream requests so bursts of tool calls don't trip USAspending rate limits.
+_admission = _Admission(int(os.getenv("USASPENDING_MAX_CONCURRENCY", "16")))
+
+# Transient upstream failures are retried with capped exponential backoff plus jitter.
+_MAX_RETRIES = int(os.getenv("USASPENDING_MAX_RETRIES", "3"))
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_RETRY_BACKOFF_BASE = 0.5
+_RETRY_BACKOFF_CAP = 8.0
+_RETRY_JITTER = 0.5
+_RETRY_AFTER_MAX = 30.0
+
+# Short-lived cache for idempotent GET endpoints; USAspending itself caches for an hour.
+_CACHE_TTL = float(os.getenv("USASPENDING_CACHE_TTL", "300"))
+_response_cache: TTLCache = TTLCache(maxsize=1024, ttl=_CACHE_TTL)
+
+# Lookup misses (e.g. unknown DUNS/UEI) are remembered briefly, in a separate cache so they
+# never evict hot positive entries.
+_NEGATIVE_CACHE_TTL = float(os.getenv("USASPENDING_NEGATIVE_CACHE_TTL", "60"))
+_NEGATIVE_CACHE_STATUSES = frozenset({400, 404})
+_negative_cache: TTLCache = TTLCache(maxsize=1024, ttl=_NEGATIVE_CACHE_TTL)
+
+# Requests currently on the wire, so identical concurrent calls share one round trip.
+_inflight: Dict[str, asyncio.Future] = {}
+
 
 async def _raise_for_usaspending(resp: httpx.Response) -> None:
     """Normalize HTTP errors into user-visible ToolError messages."""
@@ -28,7 +177,7 @@ async def _raise_for_usaspending(resp: httpx.Response) -> None:
         # Try to include any server-provided JSON detail when safe.
         detail = ""
         try:
-            payload = resp.json()
+            payload = orjson.loads(resp.content)
             detail = f" Response: {payload}" if payload else ""
         except Exception:
             # Fallback to text (truncated)
@@ -38,6 +187,224 @@ async def _raise_for_usaspending(resp: httpx.Response) -> None:
         raise ToolError(f"USAspending API error {resp.status_code} for {resp.request.method} {resp.request.url}.{detail}") from e
 
 
+def _request_key(
+    method: str,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    body: Optional[bytes] = None,
+) -> str:
+    """Build a stable key identifying a request by method, path, query and body."""
+    key = json.dumps([method, path, params], sort_keys=True, default=str)
+    return key if body is None else key + body.decode()
+
+
+def _retry_delay(attempt: int, resp: Optional[httpx.Response] = None) -> float:
+    """Seconds to wait before retry number ``attempt + 1``, honoring Retry-After when present."""
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), _RETRY_AFTER_MAX)
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(retry_after)
+                return min(max((when - datetime.now(timezone.utc)).total_seconds(), 0.0), _RETRY_AFTER_MAX)
+            except (TypeError, ValueError):
+                pass
+    return min(_RETRY_BACKOFF_CAP, _RETRY_BACKOFF_BASE * 2**attempt) + random.random() * _RETRY_JITTER
+
+
+async def _send(
+    method: str, url: str, *, stream: bool = False, **kwargs: Any
+) -> Tuple[httpx.Response, Union[bytes, bytearray]]:
+    """Send one request and return the response together with its (decompressed) body."""
+    if not stream:
+        resp = await _http_client.request(method, url, **kwargs)
+        return resp, resp.content
+
+    # Large result sets are read chunk by chunk into a single buffer rather than through
+    # Response.aread(), which keeps every chunk alive until it joins them into a copy.
+    resp = await _http_client.send(_http_client.build_request(method, url, **kwargs), stream=True)
+    try:
+        if not resp.is_success:
+            return resp, await resp.aread()
+        content = bytearray()
+        async for chunk in resp.aiter_bytes():
+            content += chunk
+        return resp, content
+    finally:
+        await resp.aclose()
+
+
+async def _request_with_retry(
+    method: str, url: str, *, stream: bool = False, **kwargs: Any
+) -> Tuple[httpx.Response, Union[bytes, bytearray]]:
+    """Send a request, retrying transport errors and transient statuses up to _MAX_RETRIES times."""
+    attempt = 0
+    while True:
+        try:
+            async with _admission:
+                resp, content = await _send(method, url, stream=stream, **kwargs)
+        except httpx.TransportError:
+            if attempt >= _MAX_RETRIES:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+        else:
+            await _admission.record(resp.status_code)
+            if resp.status_code not in _RETRY_STATUSES or attempt >= _MAX_RETRIES:
+                return resp, content
+            await asyncio.sleep(_retry_delay(attempt, resp))
+        attempt += 1
+
+
+async def _fetch(
+    method: str,
+    path: str,
+    key: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    body: Optional[bytes] = None,
+    stream: bool = False,
+) -> Any:
+    """Issue a single request and return the decoded JSON payload."""
+    resp, content = await _request_with_retry(
+        method,
+        path,
+        stream=stream,
+        params=params,
+        content=body,
+        headers=_JSON_CONTENT_TYPE if body is not None else None,
+    )
+    try:
+        await _raise_for_usaspending(resp)
+    except ToolError as e:
+        if resp.status_code in _NEGATIVE_CACHE_STATUSES:
+            _negative_cache[key] = str(e)
+        raise
+    # Decoded exactly once and handed back as-is (cache and coalesced waiters share the same
+    # object); FastMCP needs a Python value for structured output and serializes it itself.
+    return orjson.loads(content)
+
+
+async def _coalesced(
+    method: str,
+    path: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    body: Optional[bytes] = None,
+    key: Optional[str] = None,
+    stream: bool = False,
+) -> Any:
+    """Fetch a payload, sharing the result with an identical request already in flight."""
+    if key is None:
+        key = _request_key(method, path, params, body)
+
+    miss = _negative_cache.get(key)
+    if miss is not None:
+        raise ToolError(miss)
+
+    pending = _inflight.get(key)
+    if pending is None:
+        # The fetch runs as its own task so it belongs to no single caller: cancelling
+        # whichever caller started it must not cancel it for everyone else.
+        pending = asyncio.ensure_future(_fetch(method, path, key, params=params, body=body, stream=stream))
+        _inflight[key] = pending
+        pending.add_done_callback(functools.partial(_inflight_done, key))
+
+    # Shield so a cancelled caller only stops waiting; the shared request carries on.
+    return await asyncio.shield(pending)
+
+
+def _inflight_done(key: str, task: asyncio.Future) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        # Callers re-raise it themselves; mark it retrieved so asyncio doesn't warn when every
+        # caller has already gone away.
+        task.exception()
+
+
+async def _cached_get(path: str, params: Dict[str, Any], *, stream: bool = False) -> Any:
+    """GET a JSON payload, serving repeat (path, params) pairs from the TTL cache."""
+    key = _request_key("GET", path, params)
+    try:
+        return _response_cache[key]
+    except KeyError:
+        pass
+
+    payload = await _coalesced("GET", path, params=params, key=key, stream=stream)
+    _response_cache[key] = payload
+    return payload
+
+
+class RecipientAutocompleteReq(msgspec.Struct, omit_defaults=True):
+    """JSON body for POST /api/v2/autocomplete/recipient/."""
+
+    search_text: str
+    limit: int
+    recipient_levels: Optional[List[str]] = None
+
+
+class SpendingByAwardReq(msgspec.Struct, omit_defaults=True):
+    """JSON body for POST /api/v2/search/spending_by_award/."""
+
+    filters: Dict[str, Any]
+    fields: List[str]
+    order: str
+    subawards: bool
+    spending_level: str
+    limit: Optional[int] = None
+    page: Optional[int] = None
+    sort: Optional[str] = None
+    last_record_unique_id: Optional[int] = None
+    last_record_sort_value: Optional[str] = None
+
+
+def _encode(req: msgspec.Struct) -> bytes:
+    # Deterministic key order keeps the encoded body usable as a coalescing/cache key.
+    return msgspec.json.encode(req, order="deterministic")
+
+
+def _require_positive(name: str, value: int) -> None:
+    if value < 1:
+        raise ToolError(f"{name} must be >= 1.")
+
+
+def _is_iso_date(value: Any) -> bool:
+    if not isinstance(value, str) or not _DATE_RE.match(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _validate_filters(filters: Dict[str, Any]) -> None:
+    """Reject malformed time_period / award_type_codes locally instead of paying for an upstream 400."""
+    time_period = filters.get("time_period")
+    if time_period is not None:
+        if not isinstance(time_period, list):
+            raise ToolError("filters.time_period must be an array of {start_date, end_date} objects.")
+        for period in time_period:
+            if not isinstance(period, dict):
+                raise ToolError("filters.time_period must be an array of {start_date, end_date} objects.")
+            for field in ("start_date", "end_date"):
+                value = period.get(field)
+                if value is not None and not _is_iso_date(value):
+                    raise ToolError(f"filters.time_period {field} must be a YYYY-MM-DD date, got {value!r}.")
+
+    codes = filters.get("award_type_codes")
+    if codes is not None:
+        if not isinstance(codes, list):
+            raise ToolError("filters.award_type_codes must be an array of strings.")
+        unknown = [c for c in codes if not isinstance(c, str) or c not in _AWARD_TYPE_CODES]
+        if unknown:
+            raise ToolError(
+                f"filters.award_type_codes contains unknown codes {unknown}; "
+                f"allowed: {', '.join(sorted(_AWARD_TYPE_CODES))}."
+            )
+
+
 @mcp.tool
 async def recipient_autocomplete(
     search_text: str,
@@ -51,18 +418,12 @@ async def recipient_autocomplete(
     """
     if not search_text or not search_text.strip():
         raise ToolError("search_text is required and cannot be empty.")
-    if limit < 1:
-        raise ToolError("limit must be >= 1.")
+    _require_positive("limit", limit)
     if limit > 500:
         raise ToolError("limit must be <= 500.")
 
-    body: Dict[str, Any] = {"search_text": search_text, "limit": limit}
-    if recipient_levels is not None:
-        body["recipient_levels"] = recipient_levels
-
-    resp = await _http_client.post("/api/v2/autocomplete/recipient/", json=body)
-    await _raise_for_usaspending(resp)
-    return resp.json()
+    req = RecipientAutocompleteReq(search_text=search_text, limit=limit, recipient_levels=recipient_levels)
+    return await _coalesced("POST", "/api/v2/autocomplete/recipient/", body=_encode(req))
 
 
 @mcp.tool
@@ -82,17 +443,13 @@ async def recipient_list(
         "fiscal_year": fiscal_year,
     }
     if limit is not None:
-        if limit < 1:
-            raise ToolError("limit must be >= 1.")
+        _require_positive("limit", limit)
         params["limit"] = limit
     if page is not None:
-        if page < 1:
-            raise ToolError("page must be >= 1.")
+        _require_positive("page", page)
         params["page"] = page
 
-    resp = await _http_client.get("/api/v2/award_spending/recipient/", params=params)
-    await _raise_for_usaspending(resp)
-    return resp.json()
+    return await _cached_get("/api/v2/award_spending/recipient/", params, stream=True)
 
 
 @mcp.tool
@@ -115,38 +472,32 @@ async def spending_by_award(
     """
     if not isinstance(filters, dict) or not filters:
         raise ToolError("filters must be a non-empty object.")
+    _validate_filters(filters)
     if not isinstance(fields, list) or not fields:
         raise ToolError("fields must be a non-empty array of strings.")
-    if order not in ("asc", "desc"):
+    if order not in _ORDERS:
         raise ToolError("order must be 'asc' or 'desc'.")
-    if spending_level not in ("awards", "subawards"):
+    if spending_level not in _LEVELS:
         raise ToolError("spending_level must be 'awards' or 'subawards'.")
 
-    body: Dict[str, Any] = {
-        "filters": filters,
-        "fields": fields,
-        "order": order,
-        "subawards": subawards,
-        "spending_level": spending_level,
-    }
     if limit is not None:
-        if limit < 1:
-            raise ToolError("limit must be >= 1.")
-        body["limit"] = limit
+        _require_positive("limit", limit)
     if page is not None:
-        if page < 1:
-            raise ToolError("page must be >= 1.")
-        body["page"] = page
-    if sort is not None:
-        body["sort"] = sort
-    if last_record_unique_id is not None:
-        body["last_record_unique_id"] = last_record_unique_id
-    if last_record_sort_value is not None:
-        body["last_record_sort_value"] = last_record_sort_value
-
-    resp = await _http_client.post("/api/v2/search/spending_by_award/", json=body)
-    await _raise_for_usaspending(resp)
-    return resp.json()
+        _require_positive("page", page)
+
+    req = SpendingByAwardReq(
+        filters=filters,
+        fields=fields,
+        order=order,
+        subawards=subawards,
+        spending_level=spending_level,
+        limit=limit,
+        page=page,
+        sort=sort,
+        last_record_unique_id=last_record_unique_id,
+        last_record_sort_value=last_record_sort_value,
+    )
+    return await _coalesced("POST", "/api/v2/search/spending_by_award/", body=_encode(req), stream=True)
 
 
 @mcp.tool
@@ -160,17 +511,15 @@ async def recipient_children(
     Returns a list of child recipients for a parent DUNS or UEI.
     Optional year: fiscal year, or 'all', or 'latest'.
     """
-    if not duns_or_uei or not duns_or_uei.strip():
-        raise ToolError("duns_or_uei is required and cannot be empty.")
+    if not duns_or_uei or not _DUNS_OR_UEI_RE.match(duns_or_uei):
+        raise ToolError("duns_or_uei must be a 9-digit DUNS or 12-character UEI (uppercase letters and digits).")
 
     params: Dict[str, Any] = {}
     if year is not None:
         params["year"] = year
 
-    path = f"/api/v2/recipient/children/{duns_or_uei.strip()}/"
-    resp = await _http_client.get(path, params=params)
-    await _raise_for_usaspending(resp)
-    return resp.json()
+    # Safe to interpolate unescaped: the identifier is already restricted to [A-Z0-9].
+    return await _cached_get(_CHILDREN_TMPL % duns_or_uei, params)
 
 
 # Optional: expose the OpenAPI YAML as a resource for easy retrieval by clients
@@ -178,25 +527,30 @@ async def recipient_children(
 @mcp.resource("usaspending://openapi/selected.yaml")
 def selected_openapi_schema() -> str:
     """Return the OpenAPI schema (selected endpoints) as YAML."""
+    return _load_selected_openapi_yaml()
+
+
+@functools.cache
+def _load_selected_openapi_yaml() -> str:
+    # The schema is static for the life of the process, so read it once.
     # Keep it light: load from a file if you prefer, but embedding is fine too.
     # If you want to load from disk, replace with: return Path("openapi.yaml").read_text()
     return os.getenv("USASPENDING_SELECTED_OPENAPI_YAML", "").strip()
 
 
-async def _close_client() -> None:
-    await _http_client.aclose()
-
-
 if __name__ == "__main__":
     try:
-        # Run with streamable HTTP transport - use Azure's PORT env var if available
-        port = int(os.getenv("PORT", 8000))
-        mcp.run(transport="streamable-http", port=port, host="0.0.0.0")
-    finally:
-        # Ensure we close the underlying HTTP client on shutdown
-        try:
-            import asyncio
+        from uvloop import run as run_loop
+    except ImportError:  # uvloop doesn't support Windows
+        from asyncio import run as run_loop
 
-            asyncio.run(_close_client())
-        except Exception:
-            pass
+    # uvicorn re-raises SIGTERM after it stops serving, which would kill the process before the
+    # lifespan teardown runs. Handle it like Ctrl-C so shutdown unwinds through _lifespan.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    # Run with streamable HTTP transport - use Azure's PORT env var if available
+    port = int(os.getenv("PORT", 8000))
+    try:
+        run_loop(mcp.run_async(transport="streamable-http", port=port, host="0.0.0.0"))
+    except KeyboardInterrupt:
+        pass